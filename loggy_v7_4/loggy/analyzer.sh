@@ -523,4 +523,8 @@ main() {
     fi
 }
 
-main "$@"
+# Run unless sourced — the web backend sources this once per worker and then
+# calls main in a subshell for each request
+if [ "${BASH_SOURCE[0]}" = "$0" ]; then
+    main "$@"
+fi
@@ -5,12 +5,24 @@ No external dependencies — stdlib only.
 Compatible with Python 3.8+ including 3.13 (cgi module removed in 3.13).
 """
 
-import os, sys, json, subprocess, shutil, tempfile, time, re, glob, uuid
-import urllib.parse, mimetypes, email
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import os, sys, json, subprocess, shutil, tempfile, time, re, uuid, gzip, select
+import urllib.parse, mimetypes, threading, concurrent.futures, shlex, signal, atexit
+import functools, csv
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from pathlib import Path
 from io import BytesIO
 
+# orjson is optional: faster and emits bytes directly; stdlib json otherwise
+try:
+    import orjson
+
+    def _dumps(data):
+        return orjson.dumps(data, default=str)
+except ImportError:
+    def _dumps(data):
+        return json.dumps(data, default=str, ensure_ascii=False,
+                          separators=(",", ":")).encode("utf-8")
+
 # ── Config ──────────────────────────────────────────────────────────────────
 PORT = int(os.environ.get("IOTECHA_PORT", 8080))
 HOST = os.environ.get("IOTECHA_HOST", "0.0.0.0")
@@ -22,105 +34,430 @@ SESSION_DIR = os.path.join(WORK_DIR, "sessions")
 ANALYZER_DIR = os.path.dirname(os.path.abspath(ANALYZER))
 SIGNATURES_FILE = os.path.join(ANALYZER_DIR, "signatures", "known_signatures.tsv")
 REGISTRY_FILE = os.path.join(ANALYZER_DIR, "signatures", "error_registry.tsv")
+# Environment for analyzer.sh runs — built once instead of per call
+_ANALYZER_ENV = {**os.environ, "TERM": "dumb", "NO_COLOR": "1"}
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(SESSION_DIR, exist_ok=True)
 
+# ── Precompiled patterns ────────────────────────────────────────────────────
+_BOUNDARY_RE = re.compile(r'boundary=([^\s;]+)')
+_NAME_RE = re.compile(r'name="([^"]+)"')
+_FILENAME_RE = re.compile(r'filename="([^"]*)"')
+# Analyzer output stays bytes until it is put into a JSON response
+_ANSI_RE = re.compile(rb'\x1b\[[0-9;]*[a-zA-Z]')
+# Control bytes dropped by strip_ansi (everything but \t \n \r), for bytes.translate
+_CTRL_BYTES = bytes(range(0x00, 0x09)) + b'\x0b\x0c' + bytes(range(0x0e, 0x20)) + b'\x7f'
+_DEVICE_RE = re.compile(rb'Device.*?:\s*(\S+)')
+# Both issue-line formats in one pass; the outer group that matched is
+# m.lastgroup. A "[SEV]" match only consumes its prefix (the title is in a
+# lookahead) so "#N SEV" lines later on the same line are still found.
+_ISSUE_RE = re.compile(
+    rb'(?P<hash>#\d+\s+(?P<hsev>CRITICAL|HIGH|MEDIUM|LOW)\s+(?P<htitle>.+?)(?:\n|$))'
+    rb'|(?P<bracket>\[(?P<bsev>CRITICAL|HIGH|MEDIUM|LOW)\]\s+(?=(?P<btitle>.+?)(?:\n|$)))')
+_HEALTH_GRADE_RE = re.compile(rb'Health Score:\s*(\d+)\s*/\s*100\s*Grade:\s*([A-F])')
+_HEALTH_PAREN_RE = re.compile(rb'Health Score:\s*(\d+)/100\s*\(([A-F])\)')
+_GREP_LINE_RE = re.compile(rb'^([^:\n]+):(\d+):([^\n]*)', re.M)
+
 # ── Multipart parser (stdlib only, no cgi module needed) ────────────────────
+_MULTIPART_CHUNK = 64 * 1024
+_SPOOL_MAX_SIZE = 1 << 20
+
 def parse_multipart(rfile, content_type, content_length):
     """Parse multipart/form-data without the deprecated cgi module.
-    Returns dict of {field_name: {'filename': str|None, 'data': bytes}}.
+    Bodies up to 1 MiB are read at once and split on the boundary; larger
+    ones are streamed in 64 KiB chunks into SpooledTemporaryFiles.
+    Returns dict of {field_name: {'filename': str|None, 'file': file object}}.
     Works on Python 3.8-3.13+.
     """
-    m = re.search(r'boundary=([^\s;]+)', content_type)
+    m = _BOUNDARY_RE.search(content_type)
     if not m:
         return {}
-    boundary = m.group(1).strip('"')
-    raw = rfile.read(content_length)
-    fake_msg = ('Content-Type: multipart/form-data; boundary="{}"\r\n\r\n'.format(boundary)).encode() + raw
-    msg = email.message_from_bytes(fake_msg)
+    boundary = m.group(1).strip('"').encode()
+    if content_length <= _SPOOL_MAX_SIZE:
+        return _split_multipart(rfile.read(content_length), boundary)
+    return _stream_multipart(rfile, boundary, content_length)
+
+def _part_disposition(head):
+    """Return (name, filename) from a part's raw header block."""
+    cd = ""
+    for hline in _text(head).split("\r\n"):
+        key, _, value = hline.partition(":")
+        if key.strip().lower() == "content-disposition":
+            cd = value.strip()
+    nm = _NAME_RE.search(cd)
+    if not nm:
+        return None, None
+    fn = _FILENAME_RE.search(cd)
+    return nm.group(1), fn.group(1) if fn else None
+
+def _split_multipart(raw, boundary):
+    # Walks boundary offsets instead of split()/partition() so each part's
+    # data is copied exactly once, by the final slice (BytesIO shares it).
+    # A delimiter only counts at the start of a line, as in _stream_multipart.
+    result = {}
+    delim = b"\r\n--" + boundary
+    if raw.startswith(delim[2:]):
+        start = len(delim) - 2  # opening boundary at offset 0, no CRLF before it
+    else:
+        pos = raw.find(delim)
+        start = pos + len(delim) if pos >= 0 else -1
+    while start >= 0:
+        if raw.startswith(b"--", start):
+            break
+        nxt = raw.find(delim, start)
+        if nxt < 0:
+            break  # no closing boundary — drop the truncated part
+        hend = raw.find(b"\r\n\r\n", start, nxt)
+        if hend >= 0:
+            name, filename = _part_disposition(raw[start:hend])
+            if name:
+                result[name] = {"filename": filename, "file": BytesIO(raw[hend + 4:nxt])}
+        start = nxt + len(delim)
+    return result
+
+def _stream_multipart(rfile, boundary, content_length):
+    delim = b"\r\n--" + boundary
+    keep = len(delim) - 1
+    # Leading CRLF lets the opening boundary match like every other one
+    buf = bytearray(b"\r\n")
+    remaining = content_length
     result = {}
-    for part in msg.walk():
-        cd = part.get("Content-Disposition", "")
-        if not cd:
+    name = None
+    out = None  # current part's file; None discards (preamble, unnamed parts)
+
+    def fill():
+        nonlocal remaining
+        if remaining <= 0:
+            return False
+        chunk = rfile.read(min(_MULTIPART_CHUNK, remaining))
+        if not chunk:
+            return False
+        remaining -= len(chunk)
+        buf.extend(chunk)
+        return True
+
+    while True:
+        idx = buf.find(delim)
+        if idx < 0:
+            # Flush everything except a possibly split delimiter at the end
+            if len(buf) > keep:
+                if out is not None:
+                    with memoryview(buf) as view:
+                        out.write(view[:-keep])
+                del buf[:-keep]
+            if not fill():
+                break
             continue
-        nm = re.search(r'name="([^"]+)"', cd)
-        if not nm:
+        if out is not None:
+            with memoryview(buf) as view:
+                out.write(view[:idx])
+            out.seek(0)
+            out = None
+        del buf[:idx + len(delim)]
+        while len(buf) < 2 or (not buf.startswith(b"--") and b"\r\n\r\n" not in buf):
+            if not fill():
+                break
+        hend = buf.find(b"\r\n\r\n")
+        if buf.startswith(b"--") or hend < 0:
+            break
+        name, filename = _part_disposition(bytes(buf[:hend]))
+        del buf[:hend + 4]
+        if not name:
             continue
-        name = nm.group(1)
-        fn = re.search(r'filename="([^"]*)"', cd)
-        filename = fn.group(1) if fn else None
-        data = part.get_payload(decode=True)
-        if data is None:
-            data = b""
-        result[name] = {"filename": filename, "data": data}
+        out = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+        result[name] = {"filename": filename, "file": out}
+    if out is not None:
+        # Body ended before the closing boundary — drop the truncated part
+        out.close()
+        del result[name]
     return result
 
 # ── Session Store ───────────────────────────────────────────────────────────
-sessions = {}
+# Requests run on separate threads. Sessions are sharded by their hex id into
+# 16 (dict, lock) pairs; a shard's dict — and the "analyzing" check-and-set of
+# its sessions — is only touched while holding that shard's lock.
+_SHARDS = [({}, threading.Lock()) for _ in range(16)]
+
+def _shard(sid):
+    try:
+        return _SHARDS[int(sid[:2], 16) & 0xF]
+    except ValueError:
+        return _SHARDS[0]  # not a session id; the lookup will just miss
+
+def get_session(sid):
+    table, lock = _shard(sid)
+    with lock:
+        return table.get(sid)
+
+def all_sessions():
+    result = []
+    for table, lock in _SHARDS:
+        with lock:
+            result.extend(table.values())
+    return result
+
+def session_count():
+    return sum(len(table) for table, _ in _SHARDS)
 
 def new_session(input_path):
     sid = uuid.uuid4().hex[:12]
     sdir = os.path.join(SESSION_DIR, sid)
     rdir = os.path.join(sdir, "reports")
     os.makedirs(rdir, exist_ok=True)
-    sessions[sid] = {
+    s = {
         "id": sid, "input_path": input_path,
         "work_dir": sdir, "reports_dir": rdir,
         "state": "loaded", "device_id": "", "analysis_mode": "",
-        "stdout": "", "stderr": "",
+        "stdout": b"", "stderr": b"", "exit_code": None,
     }
+    table, lock = _shard(sid)
+    with lock:
+        table[sid] = s
     return sid
 
+# ── Persistent analyzer workers ─────────────────────────────────────────────
+# Starting bash and sourcing analyzer.sh's ~20 modules costs more than a
+# short run like --check. A worker is a long-lived bash that sources it once
+# and runs main in a forked subshell per request, so every run still starts
+# from clean state. Needs select() on pipes, hence POSIX only.
+_WORKERS_SUPPORTED = os.name == "posix"
+# Background analyses run at once (_ANALYZER_POOL); also sizes the idle list
+_ANALYZER_THREADS = 4
+# Workers run in their own process group (so close() can kill a run's whole
+# subshell tree), which also keeps the terminal's Ctrl+C from reaching them:
+# _live_workers tracks leased ones too so the server can kill them on exit.
+_idle_workers = []
+_live_workers = set()
+_workers_lock = threading.Lock()
+
+class _AnalyzerWorker:
+    def __init__(self):
+        self.token = uuid.uuid4().hex
+        fd, self.err_path = tempfile.mkstemp(prefix="loggy_err_")
+        os.close(fd)
+        self.buf = bytearray()
+        self.proc = subprocess.Popen(
+            ["bash", "--noprofile", "--norc"], stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0,
+            cwd=ANALYZER_DIR, env=_ANALYZER_ENV, start_new_session=True)
+        with _workers_lock:
+            _live_workers.add(self)
+        # `| cat` waits for main's `exec > >(tee ...)` to flush before the marker
+        self._send(
+            "source {analyzer}\n"
+            "_loggy_run() {{ ( main \"$@\" ) 2>{err} </dev/null | cat; "
+            "printf '\\n__LOGGY_DONE_{token}__ %s\\n' \"${{PIPESTATUS[0]}}\"; }}\n"
+            "printf '__LOGGY_READY_{token}__ 0\\n'\n".format(
+                analyzer=shlex.quote(os.path.abspath(ANALYZER)),
+                err=shlex.quote(self.err_path), token=self.token))
+        try:
+            self._read_until("__LOGGY_READY_{}__ ".format(self.token).encode(), 30)
+        except Exception:
+            self.close()
+            raise
+
+    def _send(self, line):
+        self.proc.stdin.write(line.encode())
+
+    def _read_until(self, marker, timeout):
+        """Read stdout up to `marker <rc>\n`; returns (output before it, rc)."""
+        deadline = time.monotonic() + timeout
+        fd = self.proc.stdout.fileno()
+        start = 0
+        while True:
+            idx = self.buf.find(marker, start)
+            if idx >= 0:
+                end = self.buf.find(b"\n", idx + len(marker))
+                if end >= 0:
+                    out = bytes(self.buf[:idx])
+                    rc = int(self.buf[idx + len(marker):end])
+                    del self.buf[:end + 1]
+                    return out, rc
+            else:
+                start = max(0, len(self.buf) - len(marker))
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise subprocess.TimeoutExpired("analyzer worker", timeout)
+            if not select.select([fd], [], [], left)[0]:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise OSError("analyzer worker exited")
+            self.buf += chunk
+
+    def run(self, args, timeout):
+        self._send("_loggy_run {}\n".format(" ".join(shlex.quote(a) for a in args)))
+        out, rc = self._read_until("\n__LOGGY_DONE_{}__ ".format(self.token).encode(), timeout)
+        with open(self.err_path, "rb") as f:
+            err = f.read()
+        return rc, out, err
+
+    def close(self):
+        with _workers_lock:
+            _live_workers.discard(self)
+        # Once reaped, the pid (and group id) may belong to someone else
+        if self.proc.returncode is None:
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        self.proc.wait()
+        try:
+            os.unlink(self.err_path)
+        except OSError:
+            pass
+
+def _lease_worker():
+    """An idle worker that is still alive, or None."""
+    while True:
+        with _workers_lock:
+            if not _idle_workers:
+                return None
+            worker = _idle_workers.pop()
+        if worker.proc.poll() is None:
+            return worker
+        worker.close()
+
+def _release_worker(worker):
+    # Keep at most one idle worker per pool thread, plus one for /api/check
+    with _workers_lock:
+        if len(_idle_workers) <= _ANALYZER_THREADS:
+            _idle_workers.append(worker)
+            return
+    worker.close()
+
+def _run_on_worker(args, timeout):
+    worker = _lease_worker()
+    reused = worker is not None
+    while True:
+        try:
+            if worker is None:
+                worker = _AnalyzerWorker()
+            result = worker.run(args, timeout)
+            break
+        except Exception as e:
+            # A worker that timed out or died mid-run is never reused
+            if worker is not None:
+                worker.close()
+            # One that died while idle fails on the first write: retry once
+            if reused and isinstance(e, BrokenPipeError):
+                worker, reused = None, False
+                continue
+            if isinstance(e, subprocess.TimeoutExpired):
+                return 124, b"", "Timeout after {}s".format(timeout).encode()
+            return 1, b"", str(e).encode()
+    _release_worker(worker)
+    return result
+
+@atexit.register
+def _close_workers():
+    """Kill every worker, idle or in the middle of a run."""
+    with _workers_lock:
+        workers = list(_live_workers)
+        del _idle_workers[:]
+    for worker in workers:
+        worker.close()
+
 # ── Run analyzer.sh ────────────────────────────────────────────────────────
-def run_analyzer(args, timeout=120):
+def run_analyzer(args, timeout=120, fresh=False):
+    """Run analyzer.sh; returns (returncode, stdout, stderr) with raw bytes.
+    Uses a persistent worker unless fresh=True (a brand-new bash process)."""
+    if _WORKERS_SUPPORTED and not fresh:
+        return _run_on_worker(args, timeout)
     cmd = ["bash", ANALYZER] + args
     try:
         p = subprocess.run(cmd, capture_output=True, timeout=timeout,
-                           cwd=ANALYZER_DIR, env={**os.environ, "TERM": "dumb", "NO_COLOR": "1"})
-        stdout = p.stdout.decode("utf-8", errors="replace")
-        stderr = p.stderr.decode("utf-8", errors="replace")
-        return p.returncode, stdout, stderr
+                           cwd=ANALYZER_DIR, env=_ANALYZER_ENV)
+        return p.returncode, p.stdout, p.stderr
     except subprocess.TimeoutExpired:
-        return 124, "", "Timeout after {}s".format(timeout)
+        return 124, b"", "Timeout after {}s".format(timeout).encode()
     except Exception as e:
-        return 1, "", str(e)
+        return 1, b"", str(e).encode()
 
 def strip_ansi(s):
-    s = re.sub(r'\x1b\[[0-9;]*[a-zA-Z]', '', s)
-    s = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', s)
-    return s
+    # --no-color output normally has no ESC at all: skip the regex then, and
+    # drop control bytes with translate (a C table lookup, no regex engine)
+    if b'\x1b' in s:
+        s = _ANSI_RE.sub(b'', s)
+    return s.translate(None, _CTRL_BYTES)
+
+def _text(data):
+    return data.decode("utf-8", errors="replace")
+
+# ── Directory listing ───────────────────────────────────────────────────────
+def _scan_dir(path, suffix=""):
+    """Entries of path sorted by name, as os.DirEntry objects.
+    Hidden names are skipped, matching glob's "*"."""
+    try:
+        with os.scandir(path) as it:
+            entries = [e for e in it if not e.name.startswith(".") and e.name.endswith(suffix)]
+    except OSError:
+        return []
+    entries.sort(key=lambda e: e.name)
+    return entries
+
+# ── Background analysis ─────────────────────────────────────────────────────
+# Analyses can take minutes; they run here so request threads return at once
+_ANALYZER_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=_ANALYZER_THREADS)
+
+def analyze_session(sid, args):
+    s = get_session(sid)
+    try:
+        rc, out, err = run_analyzer(args, timeout=180)
+        out = strip_ansi(out); err = strip_ansi(err)
+    except Exception as e:
+        rc, out, err = 1, b"", str(e).encode()
+    m = _DEVICE_RE.search(out)
+    if m: s["device_id"] = _text(m.group(1))
+    s["stdout"] = out; s["stderr"] = err; s["exit_code"] = rc
+    reports = _scan_dir(s["reports_dir"])
+    s["state"] = "done" if rc == 0 or reports else "error"
 
 # ── Parse analysis results from reports dir ─────────────────────────────────
 def parse_session_results(sid):
-    s = sessions.get(sid)
+    """Parse issues, health and device info from the session's analyzer
+    output. Memoized on the session once analysis has finished; callers
+    get a shallow copy so adding top-level keys never touches the cache."""
+    s = get_session(sid)
     if not s:
         return None
+    stdout = s.get("stdout", b"")
+    key = (len(stdout), hash(stdout[:256]))
+    cached = s.get("_results_cache")
+    if cached and cached[0] == key:
+        return dict(cached[1])
     rdir = s["reports_dir"]
     result = {"issues": [], "metrics": {}, "status": {}, "timeline": [], "health": {},
               "deep": {}, "signatures": [], "reports": [], "device_info": {}}
-    for f in sorted(glob.glob(os.path.join(rdir, "*"))):
-        bn = os.path.basename(f)
-        result["reports"].append({"name": bn, "path": f, "size": os.path.getsize(f)})
-    stdout = s.get("stdout", "")
-    for m in re.finditer(r'#\d+\s+(CRITICAL|HIGH|MEDIUM|LOW)\s+(.+?)(?:\n|$)', stdout):
-        result["issues"].append({"severity": m.group(1), "title": m.group(2).strip()})
-    if not result["issues"]:
-        for m in re.finditer(r'\[(CRITICAL|HIGH|MEDIUM|LOW)\]\s+(.+?)(?:\n|$)', stdout):
-            result["issues"].append({"severity": m.group(1), "title": m.group(2).strip()})
-    m = re.search(r'Health Score:\s*(\d+)\s*/\s*100\s*Grade:\s*([A-F])', stdout)
-    if not m:
-        m = re.search(r'Health Score:\s*(\d+)/100\s*\(([A-F])\)', stdout)
+    for e in _scan_dir(rdir):
+        result["reports"].append({"name": e.name, "path": e.path, "size": e.stat().st_size})
+    hash_issues, bracket_issues = [], []
+    bracket_end = 0
+    for m in _ISSUE_RE.finditer(stdout):
+        if m.lastgroup == "hash":
+            hash_issues.append({"severity": _text(m.group("hsev")),
+                                "title": _text(m.group("htitle").strip())})
+        elif m.start() >= bracket_end:
+            bracket_end = m.end("btitle")
+            bracket_issues.append({"severity": _text(m.group("bsev")),
+                                   "title": _text(m.group("btitle").strip())})
+    # "#N SEV" issue lines win over "[SEV]" ones, "Grade:" health over "(X)"
+    result["issues"] = hash_issues or bracket_issues
+    m = _HEALTH_GRADE_RE.search(stdout) or _HEALTH_PAREN_RE.search(stdout)
     if m:
-        result["health"] = {"score": int(m.group(1)), "grade": m.group(2)}
-    m = re.search(r'Device.*?:\s*(\S+)', stdout)
+        result["health"] = {"score": int(m.group(1)), "grade": _text(m.group(2))}
+    m = _DEVICE_RE.search(stdout)
     if m:
-        result["device_info"]["device_id"] = m.group(1)
-    return result
+        result["device_info"]["device_id"] = _text(m.group(1))
+    # Reports are still being written while analyzing — don't pin them
+    if s["state"] != "analyzing":
+        s["_results_cache"] = (key, result)
+    return dict(result)
 
 # ── Search logs ─────────────────────────────────────────────────────────────
 def search_logs(sid, pattern, severity="", component="", after="", before="", max_results=50):
-    s = sessions.get(sid)
+    s = get_session(sid)
     if not s:
         return []
     work = s["work_dir"]
@@ -128,59 +465,154 @@ def search_logs(sid, pattern, severity="", component="", after="", before="", ma
     if not os.path.isdir(parsed_dir):
         return [{"line": "Logs not parsed yet — run analysis first"}]
     results = []
-    sev_str = ""
+    sev_str = b""
     if severity:
-        sev_map = {"E": "|E|", "W": "|W|", "I": "|I|", "C": "|C|", "N": "|N|"}
-        sev_str = sev_map.get(severity.upper(), "")
-    for f in sorted(glob.glob(os.path.join(parsed_dir, "*.parsed"))):
+        sev_map = {"E": b"|E|", "W": b"|W|", "I": b"|I|", "C": b"|C|", "N": b"|N|"}
+        sev_str = sev_map.get(severity.upper(), b"")
+    comp = component.lower().encode()
+    files = [e.name for e in _scan_dir(parsed_dir, ".parsed")]
+    if not files:
+        return results
+    # One grep over all components, listed in name order so its output is
+    # already sorted. -m caps matches per file: max_results is enough when
+    # nothing is filtered out below, otherwise leave the filters some slack
+    # and grep again uncapped if a capped file may have hidden kept lines.
+    per_file = max_results * 4 if (sev_str or comp) else max_results
+    for cap in (per_file, None):
+        cmd = ["grep", "-I", "-H", "-n", "-i"]
+        if cap:
+            cmd += ["-m", str(cap)]
+        cmd += ["-e", pattern, "--"] + files
         try:
-            cmd = ["grep", "-i", "-n", pattern, f]
-            p = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-            for line in p.stdout.strip().split("\n"):
-                if not line:
-                    continue
-                if severity and sev_str and sev_str not in line:
-                    continue
-                if component and component.lower() not in line.lower():
-                    continue
-                results.append({"file": os.path.basename(f), "line": line[:300]})
-                if len(results) >= max_results:
-                    return results
-        except:
-            pass
+            p = subprocess.run(cmd, capture_output=True, timeout=10, cwd=parsed_dir)
+        except Exception:
+            return []
+        results, truncated = _filter_grep(p.stdout, sev_str, comp, max_results, cap)
+        if not truncated:
+            return results
     return results
 
+def _filter_grep(out, sev_str, comp, max_results, cap):
+    """Keep grep -H -n lines matching the severity/component filters.
+    Returns (results, truncated); truncated means a file reached the -m cap
+    before max_results lines were kept, so later matches may be missing."""
+    results = []
+    last, hits = None, 0
+    # Filter on raw bytes; only lines that are kept get decoded. Like the
+    # per-file greps this replaced, the component filter and the 300-char cut
+    # see "lineno:content"; 4 bytes per char is enough input for the cut.
+    for m in _GREP_LINE_RE.finditer(out):
+        if m.group(1) != last:
+            if cap and hits >= cap:
+                return results, True
+            last, hits = m.group(1), 0
+        hits += 1
+        content = m.group(3)
+        if sev_str and sev_str not in content:
+            continue
+        line = m.group(2) + b":" + content
+        if comp and comp not in line.lower():
+            continue
+        results.append({"file": _text(m.group(1)), "line": _text(line[:300 * 4])[:300]})
+        if len(results) >= max_results:
+            return results, False
+    return results, bool(cap and hits >= cap)
+
 # ── List components from parsed logs ────────────────────────────────────────
 def list_components(sid):
-    s = sessions.get(sid)
+    s = get_session(sid)
     if not s:
         return []
     parsed_dir = os.path.join(s["work_dir"], "parsed")
     comps = {}
     if os.path.isdir(parsed_dir):
-        for f in glob.glob(os.path.join(parsed_dir, "*.parsed")):
-            name = os.path.basename(f).replace(".parsed", "")
+        for e in _scan_dir(parsed_dir, ".parsed"):
+            name = e.name.replace(".parsed", "")
             try:
-                with open(f) as fh:
-                    lines = fh.readlines()
-                total = len(lines)
-                errors = sum(1 for l in lines if "|E|" in l or "|C|" in l)
-                warnings = sum(1 for l in lines if "|W|" in l)
+                with open(e.path, "rb") as fh:
+                    data = fh.read()
+                total = data.count(b"\n")
+                if data and not data.endswith(b"\n"):
+                    total += 1
+                errors = data.count(b"|E|") + data.count(b"|C|")
+                warnings = data.count(b"|W|")
                 comps[name] = {"total": total, "errors": errors, "warnings": warnings}
             except:
                 comps[name] = {"total": 0, "errors": 0, "warnings": 0}
     return comps
 
 # ── Load signatures ─────────────────────────────────────────────────────────
+# Parsed signatures and their JSON body, keyed by the mtimes of both TSV
+# files. Request threads share it, so fills happen under _SIG_LOCK.
+_SIG_CACHE = {"mtime": None, "value": None, "json": None, "json_gz": None}
+_SIG_LOCK = threading.Lock()
+
+def _signature_mtimes():
+    stamps = []
+    for path in (SIGNATURES_FILE, REGISTRY_FILE):
+        try:
+            stamps.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            stamps.append(0)
+    return tuple(stamps)
+
+def _load_signatures_locked():
+    mtime = _signature_mtimes()
+    if _SIG_CACHE["mtime"] != mtime:
+        _SIG_CACHE["value"] = _read_signatures()
+        _SIG_CACHE["json"] = _SIG_CACHE["json_gz"] = None
+        _SIG_CACHE["mtime"] = mtime
+    return _SIG_CACHE["value"]
+
 def load_signatures():
+    """Return the merged signature list, re-reading the TSV files only
+    when one of them has changed on disk."""
+    with _SIG_LOCK:
+        return _load_signatures_locked()
+
+def signatures_json():
+    """/api/signatures response body and its gzip form, built once per cache fill."""
+    with _SIG_LOCK:
+        sigs = _load_signatures_locked()
+        if _SIG_CACHE["json"] is None:
+            body = _dumps({"signatures": sigs})
+            _SIG_CACHE["json_gz"] = gzip.compress(body, 6)
+            _SIG_CACHE["json"] = body
+        return _SIG_CACHE["json"], _SIG_CACHE["json_gz"]
+
+# /api/status only changes with the session count; too small to be worth gzip.
+# Stored as one (sessions, json) tuple so threads never see a mismatched pair.
+_STATUS_CACHE = [(None, None)]
+
+def status_json():
+    n = session_count()
+    cached_n, body = _STATUS_CACHE[0]
+    if cached_n != n:
+        body = _dumps({"ok": True, "version": "1.0", "sessions": n,
+                       "analyzer": ANALYZER})
+        _STATUS_CACHE[0] = (n, body)
+    return body
+
+def _tsv_rows(f):
+    """Rows of a tab-separated file, skipping blank and "#" comment lines.
+    Whitespace around the row and blank edge fields are dropped, as the old
+    line.strip().split("\\t") did."""
+    for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+        while row and not row[-1].strip():
+            row.pop()
+        while row and not row[0].strip():
+            del row[0]
+        if not row or row[0].lstrip().startswith("#"):
+            continue
+        row[0] = row[0].lstrip()
+        row[-1] = row[-1].rstrip()
+        yield row
+
+def _read_signatures():
     sigs = []
     if os.path.isfile(SIGNATURES_FILE):
-        with open(SIGNATURES_FILE) as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-                parts = line.split("\t")
+        with open(SIGNATURES_FILE, encoding="utf-8", newline="") as f:
+            for parts in _tsv_rows(f):
                 if len(parts) >= 6:
                     sigs.append({
                         "pattern": parts[0], "component": parts[1],
@@ -190,37 +622,36 @@ def load_signatures():
                         "source": "signatures"
                     })
     if os.path.isfile(REGISTRY_FILE):
-        with open(REGISTRY_FILE) as f:
-            col_map = {}
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-                parts = line.split("\t")
-                if not col_map:
-                    col_map = {name.strip(): idx for idx, name in enumerate(parts)}
+        with open(REGISTRY_FILE, encoding="utf-8", newline="") as f:
+            rows = _tsv_rows(f)
+            header = [name.strip() for name in next(rows, [])]
+            for parts in rows:
+                if len(parts) < 4:
                     continue
+                # Columns are looked up by header name; missing ones fall back
+                fields = dict(zip(header, parts))
                 def col(name, default=""):
-                    idx = col_map.get(name)
-                    if idx is not None and idx < len(parts):
-                        return parts[idx]
-                    return default
-                if len(parts) >= 4:
-                    sigs.append({
-                        "pattern": col("name"),
-                        "component": col("module"),
-                        "severity": col("severity", "MEDIUM"),
-                        "title": col("description"),
-                        "root_cause": col("description"),
-                        "fix": col("troubleshootingSteps"),
-                        "kb_url": "",
-                        "source": "registry",
-                        "module": col("module"),
-                        "errorType": col("errorType"),
-                        "onSiteRequired": col("onSiteServiceRequired", "false")
-                    })
+                    return fields.get(name, default)
+                sigs.append({
+                    "pattern": col("name"),
+                    "component": col("module"),
+                    "severity": col("severity", "MEDIUM"),
+                    "title": col("description"),
+                    "root_cause": col("description"),
+                    "fix": col("troubleshootingSteps"),
+                    "kb_url": "",
+                    "source": "registry",
+                    "module": col("module"),
+                    "errorType": col("errorType"),
+                    "onSiteRequired": col("onSiteServiceRequired", "false")
+                })
     return sigs
 
+# ── Content types ───────────────────────────────────────────────────────────
+@functools.lru_cache(maxsize=64)
+def _content_type_for(ext):
+    return mimetypes.guess_type("x" + ext)[0] or "application/octet-stream"
+
 # ── HTTP Handler ────────────────────────────────────────────────────────────
 class Handler(BaseHTTPRequestHandler):
     def log_message(self, fmt, *args):
@@ -228,9 +659,20 @@ class Handler(BaseHTTPRequestHandler):
         sys.stderr.write("  [{}] {}\n".format(ts, fmt % args))
 
     def _json(self, data, code=200):
-        body = json.dumps(data, default=str, ensure_ascii=False).encode("utf-8")
+        self._raw_json(_dumps(data), code)
+
+    def _raw_json(self, body, code=200, body_gz=None):
+        """Send a pre-serialized JSON body, preferring body_gz when the
+        client accepts gzip."""
+        gz = body_gz is not None and "gzip" in self.headers.get("Accept-Encoding", "")
+        if gz:
+            body = body_gz
         self.send_response(code)
         self.send_header("Content-Type", "application/json")
+        if body_gz is not None:
+            self.send_header("Vary", "Accept-Encoding")
+        if gz:
+            self.send_header("Content-Encoding", "gzip")
         self.send_header("Content-Length", len(body))
         self.send_header("Access-Control-Allow-Origin", "*")
         self.end_headers()
@@ -240,18 +682,20 @@ class Handler(BaseHTTPRequestHandler):
         if not os.path.isfile(path):
             self._json({"error": "Not found"}, 404)
             return
-        ct = content_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        ct = content_type or _content_type_for(os.path.splitext(path)[1].lower())
         with open(path, "rb") as f:
-            data = f.read()
-        self.send_response(200)
-        self.send_header("Content-Type", ct)
-        self.send_header("Content-Length", len(data))
-        self.send_header("Access-Control-Allow-Origin", "*")
-        if ct == "application/octet-stream":
-            self.send_header("Content-Disposition",
-                             'attachment; filename="{}"'.format(os.path.basename(path)))
-        self.end_headers()
-        self.wfile.write(data)
+            size = os.fstat(f.fileno()).st_size
+            self.send_response(200)
+            self.send_header("Content-Type", ct)
+            self.send_header("Content-Length", size)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            if ct == "application/octet-stream":
+                self.send_header("Content-Disposition",
+                                 'attachment; filename="{}"'.format(os.path.basename(path)))
+            self.end_headers()
+            # Zero-copy os.sendfile where available; socket.sendfile falls
+            # back to plain send() on platforms without it (e.g. Windows)
+            self.connection.sendfile(f, 0, size)
 
     def do_GET(self):
         parsed = urllib.parse.urlparse(self.path)
@@ -261,36 +705,41 @@ class Handler(BaseHTTPRequestHandler):
         if path == "/" or path == "/index.html":
             self._file(FRONTEND, "text/html")
         elif path == "/api/status":
-            self._json({"ok": True, "version": "1.0", "sessions": len(sessions), "analyzer": ANALYZER})
+            self._raw_json(status_json())
         elif path == "/api/sessions":
             self._json({"sessions": [
                 {"id": s["id"], "state": s["state"], "device_id": s.get("device_id",""),
                  "input": os.path.basename(s["input_path"]), "mode": s.get("analysis_mode","")}
-                for s in sessions.values()
+                for s in all_sessions()
             ]})
         elif path == "/api/check":
             rc, out, err = run_analyzer(["--check"], timeout=15)
-            self._json({"ok": rc == 0, "output": strip_ansi(out + err)})
+            self._json({"ok": rc == 0, "output": _text(strip_ansi(out + err))})
         elif path == "/api/signatures":
-            self._json({"signatures": load_signatures()})
+            body, body_gz = signatures_json()
+            self._raw_json(body, body_gz=body_gz)
         elif path.startswith("/api/session/"):
             parts = path.split("/")
             if len(parts) < 4:
                 self._json({"error": "Missing session ID"}, 400); return
             sid = parts[3]
             action = parts[4] if len(parts) > 4 else "info"
-            if sid not in sessions:
+            s = get_session(sid)
+            if not s:
                 self._json({"error": "Session not found"}, 404); return
             if action == "info":
-                s = sessions[sid]
                 self._json({"session": {
                     "id": sid, "state": s["state"], "device_id": s.get("device_id", ""),
                     "input": os.path.basename(s["input_path"]), "mode": s.get("analysis_mode", ""),
-                    "reports": [os.path.basename(f) for f in glob.glob(os.path.join(s["reports_dir"], "*"))],
+                    "exit_code": s.get("exit_code"),
+                    "reports": [e.name for e in _scan_dir(s["reports_dir"])],
                 }})
             elif action == "results":
                 r = parse_session_results(sid)
-                r["raw_output"] = sessions[sid].get("stdout", "")
+                # "analyzing" means issues/health are not complete yet
+                r["state"] = s["state"]
+                r["raw_output"] = _text(s.get("stdout", b""))
+                r["raw_errors"] = _text(s.get("stderr", b""))
                 self._json(r)
             elif action == "search":
                 results = search_logs(sid, params.get("q", ""), params.get("severity", ""),
@@ -303,7 +752,7 @@ class Handler(BaseHTTPRequestHandler):
                 fname = params.get("file", "")
                 if not fname:
                     self._json({"error": "Missing file param"}, 400); return
-                fpath = os.path.join(sessions[sid]["reports_dir"], os.path.basename(fname))
+                fpath = os.path.join(s["reports_dir"], os.path.basename(fname))
                 self._file(fpath)
             else:
                 self._json({"error": "Unknown action: {}".format(action)}, 404)
@@ -324,11 +773,13 @@ class Handler(BaseHTTPRequestHandler):
                     safe_name = os.path.basename(fileinfo["filename"])
                     dest = os.path.join(UPLOAD_DIR, "{}_{}".format(uuid.uuid4().hex[:8], safe_name))
                     with open(dest, "wb") as f:
-                        f.write(fileinfo["data"])
+                        shutil.copyfileobj(fileinfo["file"], f)
                     sid = new_session(dest)
                     self._json({"ok": True, "session_id": sid, "file": safe_name})
                 else:
                     self._json({"error": "No file"}, 400)
+                for field in fields.values():
+                    field["file"].close()
             else:
                 body = json.loads(self.rfile.read(content_length))
                 p = body.get("path", "")
@@ -344,41 +795,40 @@ class Handler(BaseHTTPRequestHandler):
             web = body.get("web", False)
             mail = body.get("mail", False)
             tickets = body.get("tickets", False)
-            if sid not in sessions:
+            s = get_session(sid)
+            if not s:
                 self._json({"error": "Session not found"}, 404); return
-            s = sessions[sid]
             args = ["-q", "--no-color", "--mode", mode, "-o", s["reports_dir"]]
             if web: args.append("--web")
             if mail: args.append("--mail")
             if tickets: args.append("--tickets")
             args.append(s["input_path"])
-            s["state"] = "analyzing"
+            with _shard(sid)[1]:
+                busy = s["state"] == "analyzing"
+                if not busy:
+                    s["state"] = "analyzing"
+            if busy:
+                self._json({"error": "Analysis already running"}, 409); return
             s["analysis_mode"] = mode
-            rc, out, err = run_analyzer(args, timeout=180)
-            out = strip_ansi(out); err = strip_ansi(err)
-            s["stdout"] = out; s["stderr"] = err
-            s["state"] = "done" if rc == 0 else "error"
-            m = re.search(r'Device.*?:\s*(\S+)', out)
-            if m: s["device_id"] = m.group(1)
-            reports = [os.path.basename(f) for f in glob.glob(os.path.join(s["reports_dir"], "*"))]
-            ok = len(reports) > 0
-            if ok: s["state"] = "done"
-            self._json({"ok": ok, "exit_code": rc, "output": out, "errors": err,
-                        "reports": reports, "session_id": sid})
+            s["_results_cache"] = None
+            _ANALYZER_POOL.submit(analyze_session, sid, args)
+            # Poll /api/session/<sid>/info until state leaves "analyzing"
+            self._json({"ok": True, "state": "analyzing", "session_id": sid})
 
         elif path == "/api/compare":
             body = json.loads(self.rfile.read(content_length))
             base = body.get("baseline", ""); target = body.get("target", "")
             if not base or not target:
                 self._json({"error": "Need baseline and target"}, 400); return
-            base_path = sessions[base]["input_path"] if base in sessions else base
-            target_path = sessions[target]["input_path"] if target in sessions else target
+            base_s, target_s = get_session(base), get_session(target)
+            base_path = base_s["input_path"] if base_s else base
+            target_path = target_s["input_path"] if target_s else target
             outdir = os.path.join(SESSION_DIR, "compare_" + uuid.uuid4().hex[:8])
             os.makedirs(outdir, exist_ok=True)
             args = ["-q", "--no-color", "-o", outdir, "--compare", base_path, target_path]
-            rc, out, err = run_analyzer(args, timeout=180)
-            reports = [os.path.basename(f) for f in glob.glob(os.path.join(outdir, "*"))]
-            self._json({"ok": rc == 0, "output": strip_ansi(out), "errors": strip_ansi(err),
+            rc, out, err = run_analyzer(args, timeout=180, fresh=True)
+            reports = [e.name for e in _scan_dir(outdir)]
+            self._json({"ok": rc == 0, "output": _text(strip_ansi(out)), "errors": _text(strip_ansi(err)),
                         "reports": reports, "reports_dir": outdir})
 
         elif path == "/api/fleet":
@@ -389,9 +839,9 @@ class Handler(BaseHTTPRequestHandler):
             outdir = os.path.join(SESSION_DIR, "fleet_" + uuid.uuid4().hex[:8])
             os.makedirs(outdir, exist_ok=True)
             args = ["-q", "--no-color", "-o", outdir, "--fleet", directory]
-            rc, out, err = run_analyzer(args, timeout=300)
-            reports = [os.path.basename(f) for f in glob.glob(os.path.join(outdir, "*"))]
-            self._json({"ok": rc == 0, "output": strip_ansi(out), "errors": strip_ansi(err),
+            rc, out, err = run_analyzer(args, timeout=300, fresh=True)
+            reports = [e.name for e in _scan_dir(outdir)]
+            self._json({"ok": rc == 0, "output": _text(strip_ansi(out)), "errors": _text(strip_ansi(err)),
                         "reports": reports, "reports_dir": outdir})
         else:
             self._json({"error": "Not found"}, 404)
@@ -411,7 +861,7 @@ if __name__ == "__main__":
         sys.exit(1)
 
     try:
-        server = HTTPServer((HOST, PORT), Handler)
+        server = ThreadingHTTPServer((HOST, PORT), Handler)
     except OSError as e:
         sys.stderr.write("  ERROR: Cannot bind to port {} — {}\n".format(PORT, e))
         sys.stderr.write("  Tip: Try a different port with --port 9090\n")
@@ -442,3 +892,5 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("\n  Server stopped.")
         server.server_close()
+        # Before shutdown joins the pool threads, which wait on these
+        _close_workers()